@@ -89,7 +89,7 @@ def build_error_page(document: Document, title: str, exc: BaseException):
     """
     document.title = title
 
-    content = '\n'.join(traceback.format_exception(exc))
+    content = ''.join(traceback.format_exception(exc))
     document.add_root(PreText(text=content))
 
 
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import functools
 import sys
+from collections.abc import Iterable
 from typing import NamedTuple
 
 import numpy as np
@@ -26,76 +28,103 @@ __all__ = [
 ]
 
 
-class ElectrodeDensity:
-    def __init__(self, electrode: int, channel: int):
-        self.electrode = electrode
-        self.channel = channel
+def npx_electrode_density(chmap: ChannelMap) -> NDArray[np.float32]:
+    """
+
+    :param chmap:
+    :return: density curve array. Array[float32, S, (v, y), Y].
+    """
+    from scipy.ndimage import convolve, maximum_filter1d
+
+    kind = chmap.probe_type
+    S = kind.n_shank
+    C = kind.n_col_shank
+    R = kind.n_row_shank
 
-    def __add__(self, other: ElectrodeDensity) -> ElectrodeDensity:
-        return ElectrodeDensity(self.electrode + other.electrode, self.channel + other.channel)
+    # Array[bool, S, C, R], electrodes used as channels, filled through raveled indices.
+    index = np.ravel_multi_index(_electrode_coords(chmap.electrodes), (S, C, R))
+    occupied = np.zeros((S, C, R), dtype=bool)
+    occupied.ravel()[index] = True
 
-    def __iadd__(self, other: ElectrodeDensity) -> Self:
-        self.electrode += other.electrode
-        self.channel += other.channel
-        return self
+    # number of channels within the 3x3 neighborhood. counts are at most 9, so uint8 is enough.
+    channel = convolve(occupied.view(np.uint8), np.ones((1, 3, 3), dtype=np.uint8), mode='constant', cval=0)
 
-    def __float__(self) -> float:
-        return self.channel / self.electrode
+    # number of electrodes (inside the shank) within the 3x3 neighborhood,
+    # which is the product of in-range neighbor columns and in-range neighbor rows.
+    electrode = np.multiply.outer(_n_neighbor(C), _n_neighbor(R))
 
-    def __str__(self):
-        return f'{self.channel}/{self.electrode}'
+    # Array[float32, S, R], max channel density of each row
+    s, c, r = np.unravel_index(index, (S, C, R))
+    x = np.zeros((S, R), dtype=np.float32)
+    np.maximum.at(x, (s, r), np.divide(channel[s, c, r], electrode[c, r], dtype=np.float32))
 
+    x = maximum_filter1d(x, size=3, axis=1, mode='nearest')
+    y = np.arange(0, R, dtype=np.float32) * np.float32(kind.r_space)
+    return np.stack([x, np.broadcast_to(y, x.shape)], axis=1)
 
-def npx_electrode_density(chmap: ChannelMap) -> NDArray[np.float_]:
+
+def _electrode_coords(electrodes: Iterable[Electrode]) -> NDArray[np.int16]:
     """
+    Collect electrode coordinates in struct-of-arrays layout.
 
-    :param chmap:
-    :return: density curve array. Array[float, S, (v, y), Y].
+    :param electrodes: electrodes
+    :return: Array[int16, 3, N], (shank, column, row) of each electrode.
     """
-    from scipy.ndimage import maximum_filter
+    ret = np.fromiter(((it.shank, it.column, it.row) for it in electrodes), dtype=(np.int16, 3))
+    return ret.reshape(-1, 3).T
 
-    kind = chmap.probe_type
-    electrodes = set([(it.shank, it.column, it.row) for it in chmap.electrodes])
-    C = kind.n_col_shank
-    R = kind.n_row_shank
 
-    def find(s: int, c: int, r: int) -> ElectrodeDensity:
-        if 0 <= r < R and 0 <= c < C:
-            if (s, c, r) in electrodes:
-                return ElectrodeDensity(1, 1)
-            else:
-                return ElectrodeDensity(1, 0)
-        return ElectrodeDensity(0, 0)
+def _n_neighbor(n: int) -> NDArray[np.int_]:
+    """number of in-range indices among (i-1, i, i+1) for each index i in range(n)."""
+    i = np.arange(n)
+    return np.minimum(i + 1, n - 1) - np.maximum(i - 1, 0) + 1
 
-    def density(ch: Electrode) -> float:
-        s = ch.shank
-        c = ch.column
-        r = ch.row
 
-        d = ElectrodeDensity(1, 1)
-        d += find(s, c - 1, r - 1)
-        d += find(s, c, r - 1)
-        d += find(s, c + 1, r - 1)
-        d += find(s, c - 1, r)
-        d += find(s, c + 1, r)
-        d += find(s, c - 1, r + 1)
-        d += find(s, c, r + 1)
-        d += find(s, c + 1, r + 1)
-        return float(d)
+class _CategoryWeight:
+    """
+    Weight lookup table indexed by category. Categories without a given weight
+    get 0. The table is extended when a larger category value is first seen,
+    so a lookup is a single indexed load.
+    """
 
-    y = np.arange(0, kind.n_row_shank, dtype=float)
+    def __init__(self, weight: dict[int, float]):
+        self._table = np.zeros((max(weight) + 1,))
+        for category, value in weight.items():
+            self._table[category] = value
 
-    ret = []
+    def __getitem__(self, blueprint: NDArray[np.int_]) -> NDArray[np.float_]:
+        """
+        :param blueprint: Array[category:int, N]
+        :return: Array[float, N]
+        """
+        if len(blueprint) == 0:
+            return np.zeros((0,))
 
-    for shank in range(kind.n_shank):
-        x = np.zeros_like(y)
-        for ch in chmap.electrodes[shank, :, :]:
-            x[ch.row] = max(density(ch), x[ch.row])
+        if (n := int(blueprint.max()) + 1) > len(self._table):
+            self._table = np.concatenate([self._table, np.zeros((n - len(self._table),))])
 
-        x = maximum_filter(x, size=3, mode='nearest')
-        ret.append(np.vstack([x, y * kind.r_space]))
+        if blueprint.min() < 0:
+            return np.where(blueprint < 0, 0, self._table[np.maximum(blueprint, 0)])
 
-    return np.array(ret)
+        return self._table[blueprint]
+
+
+# weight of a selected electrode in npx_channel_efficiency(), indexed by category.
+_CH_W = _CategoryWeight({
+    NpxProbeDesp.CATE_SET: 1,
+    NpxProbeDesp.CATE_FULL: 1,
+    NpxProbeDesp.CATE_HALF: 1,
+    NpxProbeDesp.CATE_QUARTER: 1,
+    NpxProbeDesp.CATE_EXCLUDED: -1,
+})
+
+# weight of an electrode in npx_request_electrode(), indexed by category.
+_REQ_W = _CategoryWeight({
+    NpxProbeDesp.CATE_SET: 1,
+    NpxProbeDesp.CATE_FULL: 1,
+    NpxProbeDesp.CATE_HALF: 1 / 2,
+    NpxProbeDesp.CATE_QUARTER: 1 / 4,
+})
 
 
 @doc_link()
@@ -109,17 +138,7 @@ def npx_request_electrode(bp: BlueprintFunctions, blueprint: NDArray[np.int_] =
     if blueprint is None:
         blueprint = bp._blueprint
 
-    electrode = 0
-    for category, count in zip(*np.unique(blueprint, return_counts=True)):
-        match category:
-            case NpxProbeDesp.CATE_SET | NpxProbeDesp.CATE_FULL:
-                electrode += count
-            case NpxProbeDesp.CATE_HALF:
-                electrode += count / 2
-            case NpxProbeDesp.CATE_QUARTER:
-                electrode += count / 4
-
-    return electrode
+    return float(_REQ_W[blueprint].sum())
 
 
 @doc_link()
@@ -138,15 +157,18 @@ def npx_channel_efficiency(bp: BlueprintFunctions, channelmap: ChannelMap = None
         blueprint = bp._blueprint
 
     electrode = npx_request_electrode(bp, blueprint)
-    channel = 0
-
     selected = blueprint[bp.selected_electrodes(channelmap)]
-    for category, count in zip(*np.unique(selected, return_counts=True)):
-        match category:
-            case NpxProbeDesp.CATE_SET | NpxProbeDesp.CATE_FULL | NpxProbeDesp.CATE_HALF | NpxProbeDesp.CATE_QUARTER:
-                channel += count
-            case NpxProbeDesp.CATE_EXCLUDED:
-                channel -= count
+    return _channel_efficiency(electrode, selected)
+
+
+def _channel_efficiency(electrode: float, selected: NDArray[np.int_]) -> float:
+    """
+
+    :param electrode: number of requested electrodes, from npx_request_electrode().
+    :param selected: categories of selected electrodes. Array[category:int, N]
+    :return: channel efficiency value
+    """
+    channel = float(_CH_W[selected].sum())
 
     ae = 0 if electrode == 0 else max(channel / electrode, 0)
     ce = 0 if ae == 0 else min(ae, 1 / ae)
@@ -197,14 +219,26 @@ class ElectrodeProbability(NamedTuple):
 
     @classmethod
     def _reduce_add(cls, result: list[ElectrodeProbability]) -> Self:
+        sample_times = sum([it.sample_times for it in result])
+
+        # accumulate in place, instead of stacking all summation matrices first.
+        summation = result[0].summation.astype(_count_dtype(sample_times))
+        for it in result[1:]:
+            summation += it.summation
+
         return ElectrodeProbability(
-            sum([it.sample_times for it in result]),
-            np.sum([it.summation for it in result], axis=0),
+            sample_times,
+            summation,
             sum([it.complete for it in result]),
             np.concatenate([it.channel_efficiency_ for it in result]),
         )
 
 
+def _count_dtype(sample_times: int) -> type[np.integer]:
+    """dtype of summation matrix that could hold counts up to *sample_times*."""
+    return np.int32 if sample_times <= np.iinfo(np.int32).max else np.int64
+
+
 def npx_electrode_probability(probe: NpxProbeDesp, chmap: ChannelMap, blueprint: list[NpxElectrodeDesp],
                               selector: str | ElectrodeSelector = 'default',
                               sample_times: int = 1000,
@@ -229,28 +263,70 @@ def npx_electrode_probability(probe: NpxProbeDesp, chmap: ChannelMap, blueprint:
         return _npx_electrode_probability_n(probe, chmap, blueprint, selector, sample_times, n_worker=n_worker)
 
 
+# number of samples counted together in _npx_electrode_probability_0().
+_SAMPLE_CHUNK_SIZE = 1000
+
+
 def _npx_electrode_probability_0(probe: NpxProbeDesp, chmap: ChannelMap, blueprint: list[NpxElectrodeDesp],
                                  selector: ElectrodeSelector,
                                  sample_times: int) -> ElectrodeProbability:
     pt = chmap.probe_type
     bp = BlueprintFunctions(probe, chmap)
-    mat = np.zeros((pt.n_shank, pt.n_col_shank, pt.n_row_shank))
+    bp.set_blueprint(blueprint)
+    blueprint_arr = bp.blueprint()
+    electrode = npx_request_electrode(bp, blueprint_arr)  # the same for all samples
+    S = pt.n_shank
+    C = pt.n_col_shank
+    R = pt.n_row_shank
+
+    # channel weight of each electrode, arranged by raveled (S, C, R) index.
+    weight = np.zeros((S * C * R,))
+    coords = np.fromiter((it.electrode for it in bp.electrodes), dtype=(np.int16, 3)).reshape(-1, 3).T
+    weight[np.ravel_multi_index(coords, (S, C, R))] = _CH_W[blueprint_arr]
+
+    mat = np.zeros((S * C * R,), dtype=_count_dtype(sample_times))
+    channel = np.zeros((sample_times,))  # weighted number of selected electrodes of each sample
+
+    # raveled (S, C, R) index of selected electrodes of a chunk of samples, packed one after another.
+    # A channelmap has at most n_channels electrodes, so the buffer is allocated once, and its size
+    # does not grow with sample_times.
+    chunk = min(sample_times, _SAMPLE_CHUNK_SIZE)
+    index = np.empty((chunk * pt.n_channels,), dtype=np.intp)
+    selected = np.zeros((chunk,), dtype=int)  # number of selected electrodes of each sample in the chunk
+    start = 0  # first sample of the chunk
+    offset = 0
     complete = 0
-    channel_efficiency = []
 
-    for _ in range(sample_times):
+    for i in range(sample_times):
         chmap = selector(probe, chmap, blueprint)
 
-        for t in chmap.electrodes:
-            mat[t.shank, t.column, t.row] += 1
+        e = np.ravel_multi_index(_electrode_coords(chmap.electrodes), (S, C, R))
+        index[offset:offset + len(e)] = e
+        selected[i - start] = len(e)
+        offset += len(e)
 
         if probe.is_valid(chmap):
             complete += 1
 
-        bp.set_blueprint(blueprint)
-        channel_efficiency.append(npx_channel_efficiency(bp))
+        # count the chunk at once.
+        if (n := i + 1 - start) == chunk or i + 1 == sample_times:
+            e = index[:offset]
+            mat += np.bincount(e, minlength=S * C * R).astype(mat.dtype, copy=False)
+            sample = np.repeat(np.arange(n), selected[:n])
+            channel[start:i + 1] = np.bincount(sample, weights=weight[e], minlength=n)
+            start = i + 1
+            offset = 0
 
-    return ElectrodeProbability(sample_times, mat, complete, np.array(channel_efficiency))
+    mat = mat.reshape((S, C, R))
+
+    if electrode == 0:
+        channel_efficiency = np.zeros((sample_times,))
+    else:
+        ae = np.maximum(channel / electrode, 0)
+        with np.errstate(divide='ignore'):
+            channel_efficiency = np.where(ae == 0, 0, np.minimum(ae, 1 / ae))
+
+    return ElectrodeProbability(sample_times, mat, complete, channel_efficiency)
 
 
 def _npx_electrode_probability_n(probe: NpxProbeDesp, chmap: ChannelMap, blueprint: list[NpxElectrodeDesp],
@@ -266,11 +342,15 @@ def _npx_electrode_probability_n(probe: NpxProbeDesp, chmap: ChannelMap, bluepri
     assert sum(sample_times_list) == sample_times
 
     import multiprocessing
+
+    job = functools.partial(_npx_electrode_probability_0, probe, chmap, blueprint, selector)
+
+    # reduce results in worker order, as they are ready, so at most two results are held at the same
+    # time, and channel_efficiency_ keeps the same order between runs.
+    result: ElectrodeProbability | None = None
     with multiprocessing.Pool(n_worker) as pool:
-        jobs = []
-        for _sample_times in sample_times_list:
-            jobs.append(pool.apply_async(_npx_electrode_probability_0, (probe, chmap, blueprint, selector, _sample_times)))
-        pool.close()
-        pool.join()
+        for it in pool.imap(job, sample_times_list, chunksize=1):
+            result = it if result is None else ElectrodeProbability._reduce_add([result, it])
 
-    return ElectrodeProbability._reduce_add([it.get() for it in jobs])
+    assert result is not None
+    return result
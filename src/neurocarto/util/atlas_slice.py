@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import abc
+import functools
 import math
+import os
 import sys
+import tempfile
+import threading
+from pathlib import Path
 from typing import Literal, TypeVar, Final, overload, NamedTuple, get_args, TYPE_CHECKING
 
 import numpy as np
 from numpy.typing import NDArray
 
-from neurocarto.util.utils import all_int, align_arr, all_float
+from neurocarto.util.utils import align_arr
 
 if sys.version_info >= (3, 11):
     from typing import Self
@@ -27,6 +32,14 @@ XY = tuple[int, int]
 PXY = tuple[int, int, int]  # (plane, x, y)
 COOR = tuple[int, int, int] | tuple[float, float, float]  # (ap, dv, ml)
 
+# serialize save_plane_major() across views and sessions in the same process,
+# so a cache file is written once.
+_PLANE_MAJOR_LOCK = threading.Lock()
+
+# scalar types for isinstance() check, same as all_int() and all_float() but without the call overhead.
+_INT = (int, np.integer)
+_FLOAT = (int, float, np.number)
+
 
 class SliceView(metaclass=abc.ABCMeta):
     """Atlas brain slice view. Here provide three kinds of view ('coronal', 'sagittal', 'transverse').
@@ -61,11 +74,14 @@ class SliceView(metaclass=abc.ABCMeta):
         :param reference: reference brain volume with shape (AP, DL, ML)
         :param resolution: um/pixel
         """
+        source = reference
         if reference is not None:
             if reference.shape != brain.reference.shape:
                 raise RuntimeError()
         else:
-            reference = brain.reference
+            # plane() gathers along the flattened volume, which needs a C-contiguous volume.
+            # An explicit reference is kept as it is, and gathered by fancy indexing if needed.
+            reference = np.ascontiguousarray(_narrow_uint16(brain.reference))
 
         self.brain = brain
         """Atlas brain"""
@@ -74,12 +90,30 @@ class SliceView(metaclass=abc.ABCMeta):
         """slice plane projection"""
 
         self.reference = reference
-        """Image Array[uint, AP, DV, ML]"""
+        """Image Array[uint, AP, DV, ML]. The default brain reference is narrowed into uint16 if possible."""
 
         self.resolution = int(brain.resolution[get_args(SLICE).index(name)])
         """um/pixel"""
 
-        self.grid_y, self.grid_x = np.mgrid[0:self.height, 0:self.width]
+        # cached properties used in hot paths
+        self._pidx, self._xidx, self._yidx = self.project_index
+        self._w, self._h, self._np = self.width, self.height, self.n_plane
+
+        # element strides of a C-order (AP, DV, ML) volume, rearranged into (p, x, y)
+        stride = (self.n_dv * self.n_ml, self.n_ml, 1)
+        self._sp, self._sx, self._sy = stride[self._pidx], stride[self._xidx], stride[self._yidx]
+
+        # broadcastable Array[int, H, 1] and Array[int, 1, W]
+        self.grid_y = np.arange(self._h, dtype=np.intp)[:, None]
+        self.grid_x = np.arange(self._w, dtype=np.intp)[None, :]
+
+        # (p, y, x) axes of the default reference for a plane-major copy. None when not applicable.
+        axes = (self._pidx, self._yidx, self._xidx)
+        self._plane_major_axes = None if source is not None or axes == (0, 1, 2) else axes
+
+        # Array[uint, P, H, W], the default reference permuted into plane-major order.
+        # None until it is loaded by load_plane_major().
+        self._volume: NDArray[np.uint] | None = None
 
     def __str__(self):
         return f'SliceView[{self.name}]'
@@ -138,32 +172,144 @@ class SliceView(metaclass=abc.ABCMeta):
         """
         pass
 
+    def plane_major_file(self, directory: str | Path) -> Path | None:
+        """
+        File of the default reference permuted into plane-major order, where each plane
+        of this view is a contiguous block.
+
+        :param directory: cache directory.
+        :return: file path, or None when this view uses an explicit reference, or the reference
+            is already in plane-major order.
+        """
+        if (axes := self._plane_major_axes) is None:
+            return None
+
+        try:
+            atlas_name = self.brain.atlas_name
+        except AttributeError:
+            return None
+
+        return Path(directory) / f'{atlas_name}_reference_{self.reference.dtype.name}_{"".join(map(str, axes))}.npy'
+
+    def load_plane_major(self, directory: str | Path) -> bool:
+        """
+        Memory-map the plane-major copy from plane_major_file(), so plane() reads
+        each plane sequentially. It does not create the file, see save_plane_major().
+
+        :param directory: cache directory.
+        :return: whether the plane-major copy is used.
+        """
+        if self._volume is not None:
+            return True
+
+        if (file := self.plane_major_file(directory)) is None or not file.exists():
+            return False
+
+        try:
+            volume = np.load(file, mmap_mode='r')
+        except (OSError, ValueError):
+            return False
+
+        shape = tuple(self.reference.shape[i] for i in self._plane_major_axes)
+        if volume.shape != shape or volume.dtype != self.reference.dtype:
+            return False
+
+        self._volume = np.asarray(volume)  # drop np.memmap subclass, keep the mapping
+        return True
+
+    def save_plane_major(self, directory: str | Path) -> Path | None:
+        """
+        Write the plane-major copy for load_plane_major(). It takes a full copy of the
+        reference volume, so it is slow for high resolution atlases.
+
+        :param directory: cache directory.
+        :return: saved file, or None when not applicable.
+        :raise OSError: fail to write the file.
+        """
+        if (file := self.plane_major_file(directory)) is None:
+            return None
+
+        with _PLANE_MAJOR_LOCK:
+            if file.exists():  # written by another view meanwhile
+                return file
+
+            file.parent.mkdir(parents=True, exist_ok=True)
+
+            # write into a unique temporary file, then move it into place, so a reader
+            # never sees a partial file.
+            with tempfile.NamedTemporaryFile(dir=file.parent, prefix=file.stem + '.', suffix='.tmp.npy', delete=False) as f:
+                tmp = Path(f.name)
+                try:
+                    np.save(f, np.ascontiguousarray(self.reference.transpose(self._plane_major_axes)))
+                except BaseException:
+                    f.close()
+                    tmp.unlink(missing_ok=True)
+                    raise
+
+            try:
+                os.replace(tmp, file)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+
+        return file
+
     def plane(self, o: int | tuple[int, int, int] | NDArray[np.int_], image: NDArray[np.uint] = None) -> NDArray[np.uint]:
         """Get brain image on plane *o*.
 
         :param o: plane, tuple (plane, dh, dv) or Array[plane:int, H, W]
-        :param image: brain volume with shape (AP, DL, ML)
+        :param image: brain volume with shape (AP, DL, ML). A C-contiguous volume is gathered
+            through a flat index, otherwise through fancy indexing, which does not copy the volume.
         :return: brain slice image with shape (height, width)
         """
         match o:
-            case o if all_int(o):
-                o = np.full_like((self.height, self.width), o)
-            case (plane, dh, dv) if all_int(plane, dh, dv):
+            case o if isinstance(o, _INT):
+                # a single plane. Keep it as a scalar, broadcasting against grid_x/grid_y.
+                o = min(max(int(o), 0), self._np - 1)
+            case (plane, dh, dv) if isinstance(plane, _INT) and isinstance(dh, _INT) and isinstance(dv, _INT):
                 o = plane + self.offset(dh, dv)
+                if o.min() < 0 or o.max() >= self._np:
+                    np.clip(o, 0, self._np - 1, out=o)
             case _ if isinstance(o, np.ndarray):
-                if o.shape != (self.height, self.width):
-                    raise RuntimeError(f'shape mismatch : {o.shape} != {(self.height, self.width)}')
+                if o.shape != (self._h, self._w):
+                    raise RuntimeError(f'shape mismatch : {o.shape} != {(self._h, self._w)}')
+                # most planes are in range, where two reductions are cheaper than a clipped copy.
+                if o.min() < 0 or o.max() >= self._np:
+                    o = np.clip(o, 0, self._np - 1)
             case _:
                 raise TypeError(repr(o))
 
         if image is not None:
             if image.shape != self.reference.shape:
                 raise RuntimeError('shape of brain volume mismatch')
+        elif (volume := self._volume) is not None:
+            # each plane is a contiguous block, read sequentially.
+            if isinstance(o, int):
+                return volume[o].copy()
+
+            flat = np.multiply(o, self._h * self._w, dtype=np.intp)
+            flat += self.grid_y * self._w
+            flat += self.grid_x
+            return volume.take(flat)
         else:
             image = self.reference
 
-        o = np.clip(o, 0, self.n_plane - 1)
-        return image[self.coor_on(o, (self.grid_x, self.grid_y))]
+        if not image.flags.c_contiguous:
+            # take() would flatten (copy) the whole volume.
+            index = [0, 0, 0]
+            index[self._pidx] = o
+            index[self._xidx] = self.grid_x
+            index[self._yidx] = self.grid_y
+            return image[tuple(index)]
+
+        # accumulate the flat index in place, so only one Array[int, H, W] is allocated.
+        if isinstance(o, int):
+            flat = (self.grid_y * self._sy + o * self._sp) + self.grid_x * self._sx
+        else:
+            flat = np.multiply(o, self._sp, dtype=np.intp)
+            flat += self.grid_y * self._sy
+            flat += self.grid_x * self._sx
+        return image.take(flat)
 
     @overload
     def coor_on(self, plane: int, o: XY | tuple[float, float], *, um=False) -> COOR:
@@ -185,44 +331,84 @@ class SliceView(metaclass=abc.ABCMeta):
         :param um: use um?
         :return: index (ap, dv, ml) or Array[int, N, (ap, dv, ml)]
         """
-        pidx, xidx, yidx = self.project_index
-        match o:
-            case (x, y) if not um and all_int(plane, x, y):
-                ret = [0, 0, 0]
-                ret[pidx] = plane
-                ret[xidx] = x
-                ret[yidx] = y
-                return tuple(ret)
-
-            case (x, y) if um and all_int(plane) and all_float(x, y):
-                ret = [0, 0, 0]
-                ret[pidx] = plane
-                ret[xidx] = int(x / self.resolution)
-                ret[yidx] = int(y / self.resolution)
-                return tuple(ret)
+        if isinstance(o, np.ndarray):
+            return self.coor_on_xy_array(plane, o, um=um)
 
+        match o:
             case (x, y):
-                plane, x, y = align_arr(plane, x, y)
-                if um:
-                    plane = plane.astype(int)
-                    x = (x / self.resolution).astype(int)
-                    y = (y / self.resolution).astype(int)
-
-                ret = [0, 0, 0]
-                ret[pidx] = plane
-                ret[xidx] = x
-                ret[yidx] = y
-                return tuple(ret)
-
-            case _ if isinstance(o, np.ndarray):
-                ret = np.zeros((len(o), 3), dtype=int)
-                ret[:, pidx] = plane
-                ret[:, xidx] = o[:, 0] if not um else (o[:, 0] / self.resolution).astype(int)
-                ret[:, yidx] = o[:, 1] if not um else (o[:, 1] / self.resolution).astype(int)
-                return ret
+                pass
             case _:
                 raise TypeError()
 
+        if not um:
+            if isinstance(plane, _INT) and isinstance(x, _INT) and isinstance(y, _INT):
+                return self.coor_on_scalar(plane, (x, y))
+        elif isinstance(plane, _INT) and isinstance(x, _FLOAT) and isinstance(y, _FLOAT):
+            return self.coor_on_scalar(plane, (x, y), um=True)
+
+        return self.coor_on_arrays(plane, (x, y), um=um)
+
+    def coor_on_scalar(self, plane: int, o: XY | tuple[float, float], *, um=False) -> COOR:
+        """coor_on() for a single point (x, y).
+
+        :param plane: plane number
+        :param o: tuple of (x, y)
+        :param um: use um?
+        :return: index (ap, dv, ml)
+        """
+        pidx, xidx, yidx = self._pidx, self._xidx, self._yidx
+        x, y = o
+        if um:
+            x = int(x / self.resolution)
+            y = int(y / self.resolution)
+
+        ret = [0, 0, 0]
+        ret[pidx] = plane
+        ret[xidx] = x
+        ret[yidx] = y
+        return tuple(ret)
+
+    def coor_on_arrays(self, plane: int | NDArray[np.int_], o: tuple[NDArray, NDArray], *,
+                       um=False) -> tuple[NDArray[np.int_], NDArray[np.int_], NDArray[np.int_]]:
+        """coor_on() for points given by separated x and y arrays.
+
+        :param plane: plane number or array
+        :param o: tuple of (Array[int|float, N], Array[int|float, N])
+        :param um: use um?
+        :return: tuple of (Array[int, N], Array[int, N], Array[int, N]) for (ap, dv, ml)
+        """
+        pidx, xidx, yidx = self._pidx, self._xidx, self._yidx
+        plane, x, y = align_arr(plane, *o)
+        if um:
+            plane = plane.astype(int)
+            x = (x / self.resolution).astype(int)
+            y = (y / self.resolution).astype(int)
+
+        ret = [0, 0, 0]
+        ret[pidx] = plane
+        ret[xidx] = x
+        ret[yidx] = y
+        return tuple(ret)
+
+    def coor_on_xy_array(self, plane: int | NDArray[np.int_], o: NDArray, *, um=False) -> NDArray[np.int_]:
+        """coor_on() for points given by an array.
+
+        :param plane: plane number or Array[int, N]
+        :param o: Array[int|float, N, (x, y)]
+        :param um: use um?
+        :return: Array[int, N, (ap, dv, ml)]
+        """
+        pidx, xidx, yidx = self._pidx, self._xidx, self._yidx
+        ret = np.empty((len(o), 3), dtype=np.int32)  # every column is filled below
+        ret[:, pidx] = plane
+        if um:
+            ret[:, xidx] = o[:, 0] / self.resolution
+            ret[:, yidx] = o[:, 1] / self.resolution
+        else:
+            ret[:, xidx] = o[:, 0]
+            ret[:, yidx] = o[:, 1]
+        return ret
+
     @overload
     def project(self, t: COOR, *, um=False) -> PXY:
         pass
@@ -238,23 +424,23 @@ class SliceView(metaclass=abc.ABCMeta):
         :param um: use um?
         :return: (plane, x, y) or Array[int, [N,], (plane, x, y)]
         """
-        p, x, y = self.project_index
+        p, x, y = self._pidx, self._xidx, self._yidx
+        if isinstance(t, np.ndarray):
+            if um:
+                t = (t / self.resolution).astype(int)
+
+            if (ndim := t.ndim) == 1:
+                return t[((p, x, y),)]
+            elif ndim == 2:
+                return t[:, (p, x, y)]
+            raise ValueError(f'wrong dimension : {ndim}')
+
         match t:
-            case (ap, dv, ml) if not um and all_int(ap, dv, ml):
+            case (ap, dv, ml) if not um and isinstance(ap, _INT) and isinstance(dv, _INT) and isinstance(ml, _INT):
                 return int(t[p]), int(t[x]), int(t[y])
-            case (ap, dv, ml) if um and all_float(ap, dv, ml):
+            case (ap, dv, ml) if um and isinstance(ap, _FLOAT) and isinstance(dv, _FLOAT) and isinstance(ml, _FLOAT):
                 res = self.resolution
                 return int(t[p] / res), int(t[x] / res), int(t[y] / res)
-            case _ if isinstance(t, np.ndarray):
-                if um:
-                    t = (t / self.resolution).astype(int)
-                match t.ndim:
-                    case 1:
-                        return t[((p, x, y),)]
-                    case 2:
-                        return t[:, (p, x, y)]
-                    case _:
-                        raise ValueError(f'wrong dimension : {t.ndim}')
             case _:
                 raise TypeError(repr(t))
 
@@ -263,11 +449,9 @@ class SliceView(metaclass=abc.ABCMeta):
 
         :param h: horizontal plane diff to the center. right side positive.
         :param v: vertical plane diff to the center. bottom side positive.
-        :return: Array[int, H, W] array
+        :return: read-only Array[int, H, W] array
         """
-        x_frame = np.round(np.linspace(-h, h, self.width)).astype(int)
-        y_frame = np.round(np.linspace(-v, v, self.height)).astype(int)
-        return np.add.outer(y_frame, x_frame)
+        return _offset(self._w, self._h, int(h), int(v))
 
     def angle_offset(self, a: tuple[float, float, float]) -> tuple[int, int]:
         """plane index offset according to angle difference *a*.
@@ -297,17 +481,19 @@ class SliceView(metaclass=abc.ABCMeta):
         match c:
             case SlicePlane(plane, ax, ay, dw, dh, _):
                 pass
-            case c if all_int(c):
+            case c if isinstance(c, _INT):
                 if um:
                     c = int(c / self.resolution)
                 plane = int(c)
-                ax = int(self.width // 2)
-                ay = int(self.height // 2)
+                ax = self._w // 2
+                ay = self._h // 2
             case (ap, dv, ml):
-                c = np.array(c)
                 if um:
-                    c = np.round(c / self.resolution).astype(int)
-                plane, ax, ay = self.project(tuple(c))
+                    res = self.resolution
+                    ap = round(ap / res)
+                    dv = round(dv / res)
+                    ml = round(ml / res)
+                plane, ax, ay = self.project((ap, dv, ml))
             case _ if isinstance(c, np.ndarray):
                 if um:
                     c = np.round(c / self.resolution).astype(int)
@@ -318,6 +504,31 @@ class SliceView(metaclass=abc.ABCMeta):
         return SlicePlane(plane, ax, ay, dw, dh, self)
 
 
+def _narrow_uint16(image: NDArray[np.uint]) -> NDArray[np.uint]:
+    """
+    Cast an unsigned integer volume into uint16 when all its values fit in, which halves the
+    memory traffic of SliceView.plane().
+    """
+    if image.dtype.kind == 'u' and image.dtype.itemsize > 2 and image.max() <= np.iinfo(np.uint16).max:
+        return image.astype(np.uint16)
+    return image
+
+
+@functools.lru_cache(maxsize=16)
+def _offset(width: int, height: int, h: int, v: int) -> NDArray[np.int_]:
+    """
+    Cached implementation of SliceView.offset(). The returned array is shared between callers,
+    so it is marked read-only.
+    """
+    x_frame = np.linspace(-h, h, width)
+    y_frame = np.linspace(-v, v, height)
+    np.rint(x_frame, out=x_frame)
+    np.rint(y_frame, out=y_frame)
+    ret = y_frame.astype(np.int32)[:, None] + x_frame.astype(np.int32)[None, :]
+    ret.setflags(write=False)
+    return ret
+
+
 class CoronalView(SliceView):
 
     @property
@@ -444,7 +655,7 @@ class SlicePlane(NamedTuple):
     @property
     def plane_offset(self) -> NDArray[np.int_]:
         offset = self.slice.offset(self.dw, self.dh)
-        return self.plane + offset - offset[self.ay, self.ax]
+        return offset + (self.plane - int(offset[self.ay, self.ax]))
 
     @overload
     def plane_idx_at(self, x: int | float, y: int | float, *, um=False) -> int:
@@ -458,18 +669,14 @@ class SlicePlane(NamedTuple):
         if self.dw == self.dh == 0:
             return self.plane
 
-        match (x, y):
-            case (x, y) if all_float(x, y):
-                if not um:
-                    res = self.resolution
-                    x *= res
-                    y *= res
-            case _:
-                x, y = align_arr(x, y)
-                if not um:
-                    res = self.resolution
-                    x = x * res
-                    y = y * res
+        if isinstance(x, _FLOAT) and isinstance(y, _FLOAT):
+            return self.plane_idx_at_scalar(x, y, um=um)
+
+        x, y = align_arr(x, y)
+        if not um:
+            res = self.resolution
+            x = x * res
+            y = y * res
 
         cx = self.width / 2
         cy = self.height / 2
@@ -477,11 +684,24 @@ class SlicePlane(NamedTuple):
         dw = self.dw / cx * (x - cx)
         dh = self.dh / cy * (y - cy)
         dp = self.plane + dw + dh
+        return dp.astype(int)
 
-        if isinstance(dp, np.ndarray):
-            return dp.astype(int)
-        else:
-            return int(dp)
+    def plane_idx_at_scalar(self, x: int | float, y: int | float, *, um=False) -> int:
+        """plane_idx_at() for a single point (x, y)."""
+        dw = self.dw
+        dh = self.dh
+        if dw == dh == 0:
+            return self.plane
+
+        view = self.slice
+        res = view.resolution
+        if not um:
+            x *= res
+            y *= res
+
+        cx = view._w * res / 2
+        cy = view._h * res / 2
+        return int(self.plane + dw / cx * (x - cx) + dh / cy * (y - cy))
 
     @overload
     def coor_on(self, o: XY | tuple[float, float] = None, *, um=False) -> COOR:
@@ -502,7 +722,7 @@ class SlicePlane(NamedTuple):
         :return:  index (ap, dv, ml) or Array[int, N, (ap, dv, ml)]
         """
         if o is None:
-            return self.slice.coor_on(self.plane_idx_at(self.ax, self.ay), (self.ax, self.ay), um=um)
+            return self.slice.coor_on(self.plane_idx_at_scalar(self.ax, self.ay), (self.ax, self.ay), um=um)
         elif isinstance(o, tuple):
             return self.slice.coor_on(self.plane_idx_at(o[0], o[1], um=um), o, um=um)
         else:
@@ -515,7 +735,7 @@ class SlicePlane(NamedTuple):
         return self._replace(plane=plane)
 
     def with_anchor(self, x: int, y: int) -> Self:
-        plane = self.plane_idx_at(x, y)
+        plane = self.plane_idx_at_scalar(x, y)
         return self._replace(plane=plane, ax=x, ay=y)
 
     def with_offset(self, dw: int, dh: int) -> Self:
@@ -1,5 +1,6 @@
 import functools
 import inspect
+import sys
 from collections.abc import Callable
 from pathlib import Path
 from typing import Any, Literal
@@ -118,12 +119,20 @@ def is_recursive_called(limit=100) -> bool:
     :param limit:
     :return:
     """
-    stack = inspect.stack()
-    caller = stack[1]
-
-    for i, frame in enumerate(stack[2:]):
-        if i < limit and frame.filename == caller.filename and frame.function == caller.function:
+    # walk frames directly. inspect.stack() also loads source context for every frame,
+    # which is costly in callbacks fired on every slider tick.
+    caller = sys._getframe(1).f_code
+    filename = caller.co_filename
+    function = caller.co_name
+
+    frame = sys._getframe(2)
+    i = 0
+    while frame is not None and i < limit:
+        code = frame.f_code
+        if code.co_filename == filename and code.co_name == function:
             return True
+        frame = frame.f_back
+        i += 1
     return False
 
 
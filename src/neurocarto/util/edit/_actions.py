@@ -12,6 +12,10 @@ if TYPE_CHECKING:
     from neurocarto.util.probe_coor import ProbeCoordinate
     from neurocarto.views.atlas import Label
 
+_F = NpxProbeDesp.CATE_FULL
+_H = NpxProbeDesp.CATE_HALF
+_X = NpxProbeDesp.CATE_EXCLUDED
+
 
 @use_probe(NpxProbeDesp, 24)
 def npx24_single_shank(bp: BlueprintFunctions, shank: int = 0, row: int = 0):
@@ -84,9 +88,7 @@ def move_blueprint(bp: BlueprintFunctions, y: int, shank: list[int] = None, upda
     if shank is None:
         mask = None
     else:
-        mask = np.zeros_like(bp.s, dtype=bool)
-        for s in shank:
-            np.logical_or(mask, bp.s == s, out=mask)
+        mask = np.isin(bp.s, shank)
 
     bp.set_blueprint(bp.move(bp.blueprint(), ty=y, mask=mask, axis=0, init=bp.CATE_UNSET))
     if update:
@@ -108,11 +110,23 @@ def exchange_shank(bp: BlueprintFunctions, shank: list[int], update=False):
     ns = np.max(bp.s) + 1
     if len(shank) != np.max(ns):
         raise RuntimeError(f'not a {ns}-length list: {shank}')
+    if not all(0 <= s < ns for s in shank):
+        raise RuntimeError(f'shank out of range [0, {ns}): {shank}')
+
+    # Array[index:int, S, N], electrode indices grouped by shank, keeping their original order.
+    index = np.argsort(bp.s, kind='stable')
+    try:
+        index = index.reshape(ns, -1)
+    except ValueError as e:
+        raise RuntimeError('shanks have different electrode numbers') from e
+
+    # source electrode index for each electrode
+    source = np.empty_like(bp.s, dtype=index.dtype)
+    source[index] = index[np.asarray(shank)]
 
     p = bp.blueprint()
-    q = bp.new_blueprint()
-    for i, s in enumerate(shank):
-        q[bp.s == i] = p[bp.s == s]
+    q = np.empty_like(p)  # every electrode is written by the gather below
+    np.take(p, source, out=q)
 
     bp.set_blueprint(q)
     if update:
@@ -388,25 +402,19 @@ def blueprint_simple_init_script_from_activity_data_with_a_threshold(bp: Bluepri
     bp.log_message(f'{filename=}', f'{threshold=}')
     data = bp.load_data(filename)
 
-    F = NpxProbeDesp.CATE_FULL
-    H = NpxProbeDesp.CATE_HALF
-    Q = NpxProbeDesp.CATE_QUARTER
-    L = NpxProbeDesp.CATE_LOW
-    X = NpxProbeDesp.CATE_EXCLUDED
-
     bp.log_message(f'min={np.nanmin(data)}, max={np.nanmax(data)}')
 
     data = bp.interpolate_nan(data)
     bp.draw(data)
 
-    bp[np.isnan(data)] = X
-    bp.reduce(X, 20, bi=False)
-    bp.fill(X, gap=None, threshold=10, unset=True)
+    bp[np.isnan(data)] = _X
+    bp.reduce(_X, 20, bi=False)
+    bp.fill(_X, gap=None, threshold=10, unset=True)
 
-    bp[data >= threshold] = F
+    bp[data >= threshold] = _F
 
-    bp.fill(F, gap=None)
-    bp.fill(F, threshold=10, unset=True)
+    bp.fill(_F, gap=None)
+    bp.fill(_F, threshold=10, unset=True)
 
-    bp.extend(F, 2, threshold=(0, 100))
-    bp.extend(F, 10, H)
+    bp.extend(_F, 2, threshold=(0, 100))
+    bp.extend(_F, 10, _H)
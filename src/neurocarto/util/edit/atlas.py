@@ -5,7 +5,9 @@ from typing import TYPE_CHECKING
 import numpy as np
 
 from neurocarto.util import probe_coor
+from neurocarto.util.atlas_brain import REFERENCE
 from neurocarto.util.util_blueprint import BlueprintFunctions
+from neurocarto.util.util_numpy import closest_point_index
 from neurocarto.util.utils import SPHINX_BUILD, doc_link
 from neurocarto.views.base import ControllerView
 
@@ -199,8 +201,6 @@ def atlas_current_probe(bp: BlueprintFunctions,
     if (view := controller.get_view('AtlasBrainView')) is None:  # type: ignore[assignment]
         return None
 
-    from neurocarto.util.atlas_brain import REFERENCE
-
     brain = view.brain_slice
     try:
         origin = REFERENCE[ref][brain.slice.brain.atlas_name]
@@ -277,7 +277,6 @@ def atlas_set_anchor_on_probe(bp: BlueprintFunctions,
         electrode_x = bp.x[electrode_s]  # Array[um:float, N]
         electrode_y = bp.y[electrode_s]  # Array[um:float, N]
 
-        from neurocarto.util.util_numpy import closest_point_index
         if (i := closest_point_index(electrode_y, coor.depth, bp.dy * 2)) is not None:
             ex = electrode_x[i]
         else:
@@ -6,6 +6,7 @@ from typing import NamedTuple
 import numpy as np
 from numpy.typing import NDArray
 
+from neurocarto.util.atlas_brain import REFERENCE
 from neurocarto.util.atlas_slice import SliceView, SlicePlane
 
 if sys.version_info >= (3, 11):
@@ -57,7 +58,6 @@ class ProbeCoordinate(NamedTuple):
         :return:
         :raises KeyError:
         """
-        from neurocarto.util.atlas_brain import REFERENCE
         bregma = REFERENCE[ref][atlas_name]
 
         x = bregma[0] - ap
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+from pathlib import Path
 from typing import get_args, TypedDict, Final, NamedTuple
 
+import bokeh.io
 import numpy as np
 from bokeh.events import DoubleTap
 from bokeh.models import ColumnDataSource, GlyphRenderer, Select, Slider, UIElement, MultiChoice, Div, CheckboxGroup, tools, Range
 from numpy.typing import NDArray
 
 from neurocarto.config import CartoConfig
+from neurocarto.files import user_cache_dir
 from neurocarto.util import probe_coor
 from neurocarto.util.atlas_brain import BrainGlobeAtlas, get_atlas_brain, REFERENCE
 from neurocarto.util.atlas_slice import SlicePlane, SLICE, SliceView
 from neurocarto.util.atlas_struct import Structures
+from neurocarto.util.bokeh_app import run_later
 from neurocarto.util.bokeh_util import ButtonFactory, SliderFactory, as_callback, is_recursive_called, new_help_button
 from neurocarto.util.util_numpy import closest_point_index
 from neurocarto.views.base import Figure, StateView, BoundView, BoundaryState
@@ -76,6 +82,11 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
                                 -> update_region_image()
             (region_choose) -/-> (event callback)
                 -> update_region_image()
+            (slice/rotate sliders) -/-> (event callback)
+                -/-> (next tick, coalesced)
+                    -> update_brain_slice()
+                        -> update_image()
+                            -> update_region_image()
             (other) -/-> (event callback)
                 -> update_brain_slice()
                     -> update_image()
@@ -99,6 +110,10 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
 
         self.logger.debug('init(%s)', config.atlas_name)
         self.brain = get_atlas_brain(config.atlas_name, config.atlas_root)
+        # directory of plane-major reference copies. Not used in debug mode, where the user cache
+        # directory is the working directory.
+        self._cache_dir = None if config.debug else user_cache_dir(config)
+        self._saving_plane_major: set[str] = set()  # view names
 
         self._origin: tuple[float, float, float] | None = None
         try:
@@ -114,7 +129,15 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
         self.data_labels = ColumnDataSource(data=dict(i=[], x=[], y=[], label=[], color=[], ap=[], dv=[], ml=[]))
 
         self._brain_view: SliceView | None = None
+        self._region_view: SliceView | None = None  # annotation view, same slice as _brain_view
         self._brain_slice: SlicePlane | None = None
+        self._brain_image_cache: dict[SlicePlane, NDArray[np.uint]] = {}
+        self._pending_slider_update = False
+        self._pending_slice: int | None = None
+        self._pending_rotate = False
+        self._updating_brain_slice = False  # ignore slider events caused by update_brain_slice()
+        self._hold_image_update = False
+        self._rendered_image: tuple[NDArray[np.uint], BoundaryState] | None = None  # (image, boundary) on screen
         self._regions: dict[str, int] = {}
 
     @property
@@ -162,6 +185,7 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
     checkbox_group: CheckboxGroup
     checkbox_groups: dict[str, UIElement | GlyphRenderer]
 
+    _figure: Figure
     _figure_x_range: Range
     _figure_y_range: Range
 
@@ -174,6 +198,7 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
                       palette_region: str = 'Turbo256',
                       boundary_color: str = 'black',
                       **kwargs):
+        self._figure = f
         self._figure_x_range = f.x_range  # type: ignore[assignment]
         self._figure_y_range = f.y_range  # type: ignore[assignment]
 
@@ -278,11 +303,11 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
         self.update_brain_view(s)
 
     def _on_slice_changed(self, s: int):
-        if is_recursive_called():
+        if self._updating_brain_slice or is_recursive_called():
             return
 
-        p = self.get_plane_index(s)
-        self.update_brain_slice(p)
+        self._pending_slice = s
+        self._schedule_slider_update()
 
     def _on_checkbox_active(self, active: list[int]):
         for i, n in enumerate(self.checkbox_group.labels):
@@ -290,15 +315,36 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
                 ui.visible = i in active
 
     def _on_rotate_changed(self):
-        if is_recursive_called():
+        if self._updating_brain_slice or is_recursive_called():
             return
 
-        if (p := self._brain_slice) is not None:
-            r = p.slice.resolution
-            x = int(self.rotate_hor_slider.value / r)
-            y = int(self.rotate_ver_slider.value / r)
-            q = p.with_offset(x, y)
-            self.update_brain_slice(q)
+        self._pending_rotate = True
+        self._schedule_slider_update()
+
+    def _schedule_slider_update(self):
+        """
+        Coalesce slider events. Dragging a slider fires many events, and only the latest
+        values are processed on the next tick.
+        """
+        if not self._pending_slider_update:
+            self._pending_slider_update = True
+            run_later(self._process_slider_update)
+
+    def _process_slider_update(self):
+        self._pending_slider_update = False
+
+        if (s := self._pending_slice) is not None:
+            self._pending_slice = None
+            self.update_brain_slice(self.get_plane_index(s))
+
+        if self._pending_rotate:
+            self._pending_rotate = False
+            if (p := self._brain_slice) is not None:
+                r = p.slice.resolution
+                x = int(self.rotate_hor_slider.value / r)
+                y = int(self.rotate_ver_slider.value / r)
+                q = p.with_offset(x, y)
+                self.update_brain_slice(q)
 
     def _on_reset_rotate_horizontal(self):
         try:
@@ -362,44 +408,52 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
             raise RuntimeError()
 
         self.logger.debug('restore()')
-        self.update_brain_view(state.get('brain_slice', 'coronal'))
-
+        # restoring updates slice and boundary several times, only render the image once at the end.
+        self._hold_image_update = True
         try:
-            dp = state['slice_plane']
-        except KeyError:
-            pass
-        else:
-            self.update_brain_slice(dp, update_image=False)
+            self.update_brain_view(state.get('brain_slice', 'coronal'))
 
-        try:
-            dw = state['slice_rot_w']
-            dh = state['slice_rot_h']
-        except KeyError:
-            pass
-        else:
-            self.update_brain_slice(self.brain_slice.with_offset(dw, dh), update_image=False)
+            try:
+                dp = state['slice_plane']
+            except KeyError:
+                pass
+            else:
+                self.update_brain_slice(dp, update_image=False)
 
-        if len(labels := state.get('labels', [])) > 0:
-            for label in labels:
-                match label:
-                    case {'text': str(text), 'pos': pos_list, 'origin': str(origin), 'color': str(color)}:
-                        match pos_list:
-                            case [x, y, z]:
-                                pass
-                            case [x, y]:
-                                z = 1
-                            case _:
-                                continue
+            try:
+                dw = state['slice_rot_w']
+                dh = state['slice_rot_h']
+            except KeyError:
+                pass
+            else:
+                self.update_brain_slice(self.brain_slice.with_offset(dw, dh), update_image=False)
 
-                        pos = (float(x), float(y), float(z))
-                        self._labels.append(Label(text, pos, self._label_ref(origin), color))
+            if len(labels := state.get('labels', [])) > 0:
+                for label in labels:
+                    match label:
+                        case {'text': str(text), 'pos': pos_list, 'origin': str(origin), 'color': str(color)}:
+                            match pos_list:
+                                case [x, y, z]:
+                                    pass
+                                case [x, y]:
+                                    z = 1
+                                case _:
+                                    continue
 
-        self.update_boundary_transform(p=(state['image_dx'], state['image_dy']), s=(state['image_sx'], state['image_sx']), rt=state['image_rt'])
+                            pos = (float(x), float(y), float(z))
+                            self._labels.append(Label(text, pos, self._label_ref(origin), color))
 
-        try:
-            self.region_choose.value = state['regions']
-        except (AttributeError, KeyError):
-            pass
+            self.update_boundary_transform(p=(state['image_dx'], state['image_dy']), s=(state['image_sx'], state['image_sx']), rt=state['image_rt'])
+
+            try:
+                self.region_choose.value = state['regions']
+            except (AttributeError, KeyError):
+                pass
+        finally:
+            self._hold_image_update = False
+
+        if (plane := self._brain_slice) is not None:
+            self.update_image(self.get_slice_image(plane))
 
     # ================ #
     # updating methods #
@@ -416,7 +470,7 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
 
             self.update_brain_view(view)
         elif (plane := self._brain_slice) is not None:
-            self.update_image(plane.image)
+            self.update_image(self.get_slice_image(plane))
 
     # ====== #
     # Labels #
@@ -637,7 +691,10 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
                 view = SliceView(self.brain, 'coronal')
 
         self._brain_view = view
+        self._region_view = None
+        self._brain_image_cache.clear()
         self.logger.debug('slice_view(%s)', view.name)
+        self._load_plane_major(view)
 
         if (p := self._brain_slice) is not None:
             p = view.plane_at(p.coor_on())
@@ -647,6 +704,45 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
         self.update_brain_slice(p, update_image=False)
         self.update_boundary_transform(s=(old_state['sx'], old_state['sy']))
 
+    def _load_plane_major(self, view: SliceView):
+        """
+        Let *view* read planes from a plane-major copy of the brain reference in the user cache
+        directory. The copy is written in a worker thread at the first use, and *view* keeps
+        gathering from the reference volume until it is ready.
+        """
+        if (directory := self._cache_dir) is None:
+            return
+
+        if (file := view.plane_major_file(directory)) is None or view.load_plane_major(directory):
+            return
+
+        if view.name in self._saving_plane_major:
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # not in a server event loop
+            return
+
+        self.logger.info('save plane-major reference(%s)', file)
+        self._saving_plane_major.add(view.name)
+
+        document = bokeh.io.curdoc()
+        future = loop.run_in_executor(None, view.save_plane_major, directory)
+        future.add_done_callback(lambda f: document.add_next_tick_callback(functools.partial(self._on_plane_major_saved, view.name, f)))
+
+    def _on_plane_major_saved(self, name: str, future: asyncio.Future[Path | None]):
+        self._saving_plane_major.discard(name)
+
+        try:
+            future.result()
+        except Exception as e:
+            self.logger.warning('save plane-major reference(%s) fail', name, exc_info=e)
+            return
+
+        if (view := self._brain_view) is not None and view.name == name:
+            view.load_plane_major(self._cache_dir)
+
     # =================== #
     # SlicePlane updating #
     # =================== #
@@ -666,30 +762,36 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
 
         self._brain_slice = plane
 
+        # slider callbacks are deferred (see _schedule_slider_update()), so is_recursive_called()
+        # could not tell they are caused by here. Ignore them explicitly.
+        self._updating_brain_slice = True
         try:
-            self.slice_select.value = view.name
-        except AttributeError:
-            pass
+            try:
+                self.slice_select.value = view.name
+            except AttributeError:
+                pass
 
-        try:
-            self._update_plane_slider(view, plane)
-        except AttributeError:
-            pass
+            try:
+                self._update_plane_slider(view, plane)
+            except AttributeError:
+                pass
 
-        try:
-            self.rotate_hor_slider.step = view.resolution
-            self.rotate_ver_slider.step = view.resolution
-            if plane is not None:
-                self.rotate_hor_slider.value = plane.dw * view.resolution
-                self.rotate_ver_slider.value = plane.dh * view.resolution
-        except AttributeError:
-            pass
+            try:
+                self.rotate_hor_slider.step = view.resolution
+                self.rotate_ver_slider.step = view.resolution
+                if plane is not None:
+                    self.rotate_hor_slider.value = plane.dw * view.resolution
+                    self.rotate_ver_slider.value = plane.dh * view.resolution
+            except AttributeError:
+                pass
+        finally:
+            self._updating_brain_slice = False
 
         if update_image:
             if plane is None:
                 self.update_image(None)
             else:
-                self.update_image(plane.image)
+                self.update_image(self.get_slice_image(plane))
 
     def get_plane_offset(self, plane: int) -> float:
         view = self.brain_view
@@ -738,29 +840,100 @@ class AtlasBrainView(BoundView, StateView[AtlasBrainViewState]):
         super().on_boundary_transform(state)
 
         if (plane := self._brain_slice) is not None:
-            self.update_image(plane.image)
+            image = self.get_slice_image(plane)
+            # skip when both image and boundary are the same as those on screen.
+            if (rendered := self._rendered_image) is None or rendered[0] is not image or rendered[1] != state:
+                self.update_image(image)
 
     # ============== #
     # image updating #
     # ============== #
 
+    BRAIN_IMAGE_CACHE_SIZE = 32
+    """maximal number of cached slice images in {#get_slice_image()}"""
+
+    def get_slice_image(self, plane: SlicePlane) -> NDArray[np.uint]:
+        """
+        Get the brain image of *plane*. Recently used images are cached, so moving the slider
+        back and forth does not re-slice the brain volume.
+
+        The image is min-max normalized into uint8, because the 256 colors palette
+        does not show more precision.
+
+        :param plane:
+        :return: read-only brain slice image, Array[uint8, H, W].
+        """
+        cache = self._brain_image_cache
+        try:
+            image = cache.pop(plane)
+        except KeyError:
+            image = _normalize_uint8(plane.image)
+            image.setflags(write=False)
+            if len(cache) >= self.BRAIN_IMAGE_CACHE_SIZE:
+                del cache[next(iter(cache))]
+
+        cache[plane] = image  # move to the most recently used position
+        return image
+
+    def get_image_step(self, image: NDArray) -> int:
+        """
+        Get the stride for decimating *image*, so it does not have more pixels than the figure
+        has. It does not depend on the zoom level, because changing the figure ranges does
+        not re-render the image.
+
+        :param image: Array[uint, H, W]
+        :return: stride, at least 1.
+        """
+        try:
+            f = self._figure
+            fw = f.inner_width or f.width
+            fh = f.inner_height or f.height
+            return max(1, min(int(image.shape[1] / fw), int(image.shape[0] / fh)))
+        except (AttributeError, TypeError, ValueError, ZeroDivisionError, OverflowError):
+            return 1
+
     def update_image(self, image_data: NDArray[np.uint] | None):
+        if self._hold_image_update:
+            return
+
         if image_data is None:
             self.visible = False
-            self.data_brain.data = dict(image=[], dw=[], dh=[], x=[], y=[])
+            self.update_image_data(self.data_brain, None)
+            self._rendered_image = None
         else:
-            self.data_brain.data = self.transform_image_data(np.flipud(image_data))
+            boundary = self.get_boundary_state()
+            step = self.get_image_step(image_data)
+            self.update_image_data(self.data_brain, self.transform_image_data(image_data[::-step, ::step], boundary))
+            self._rendered_image = (image_data, boundary)
 
         self.update_region_image()
         self.update_label_position()
 
     def update_region_image(self):
         if len(self._regions) == 0 or (plane := self._brain_slice) is None:
-            self.data_region.data = dict(image=[], dw=[], dh=[], x=[], y=[])
+            self.update_image_data(self.data_region, None)
         else:
-            view = SliceView(self.brain, plane.slice.name, self.brain.annotation)
+            if (view := self._region_view) is None or view.name != plane.slice.name:
+                self._region_view = view = SliceView(self.brain, plane.slice.name, self.brain.annotation)
             plane = view.plane_at(plane)
-            self.data_region.data = self.transform_image_data(self.process_image_data(np.flipud(plane.image)))
+            image = plane.image
+            step = self.get_image_step(image)
+            self.update_image_data(self.data_region, self.transform_image_data(self.process_image_data(image[::-step, ::step])))
 
     def process_image_data(self, image: NDArray[np.uint]) -> NDArray[np.uint]:
         return self._structure.image_annotation(image, self._regions, 0)
+
+
+def _normalize_uint8(image: NDArray[np.uint]) -> NDArray[np.uint8]:
+    """Linearly map *image* from its (min, max) into uint8 (0, 255)."""
+    if image.dtype == np.uint8:
+        return image
+
+    lo = image.min()
+    hi = image.max()
+    if hi <= lo:
+        return np.zeros(image.shape, dtype=np.uint8)
+
+    ret = np.subtract(image, lo, dtype=np.float32)
+    ret *= 255 / float(hi - lo)
+    return ret.astype(np.uint8)
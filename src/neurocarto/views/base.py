@@ -600,6 +600,10 @@ class BoundView(ViewBase, InvisibleView, metaclass=abc.ABCMeta):
 
         self.data_boundary = ColumnDataSource(data=dict(x=[0], y=[0], w=[0], h=[0], r=[0], sx=[1], sy=[1]))
 
+        # (image width, image height, state), cache of get_boundary_state(). It is
+        # invalidated whenever data_boundary changes.
+        self._boundary_state: tuple[float, float, BoundaryState] | None = None
+
     # ========== #
     # properties #
     # ========== #
@@ -707,6 +711,8 @@ class BoundView(ViewBase, InvisibleView, metaclass=abc.ABCMeta):
             self.update_boundary_transform(s=1)
 
     def _on_boundary_change(self, value: dict[str, list[float]]):
+        self._boundary_state = None
+
         if is_recursive_called():
             return
 
@@ -734,14 +740,18 @@ class BoundView(ViewBase, InvisibleView, metaclass=abc.ABCMeta):
 
     def get_boundary_state(self) -> BoundaryState:
         """Get current boundary parameters."""
+        ow = self.width
+        oh = self.height
+
+        if (cache := self._boundary_state) is not None and cache[0] == ow and cache[1] == oh:
+            return cache[2].copy()
+
         data = self.data_boundary.data
         dx = float(data['x'][0])  # type: ignore
         dy = float(data['y'][0])  # type: ignore
         w = float(data['w'][0])  # type: ignore
         h = float(data['h'][0])  # type: ignore
         rt = float(data['r'][0])  # type: ignore
-        ow = self.width
-        oh = self.height
 
         if ow == 0:
             sx = 1.0
@@ -753,7 +763,9 @@ class BoundView(ViewBase, InvisibleView, metaclass=abc.ABCMeta):
         else:
             sy = h / oh
 
-        return BoundaryState(dx=dx, dy=dy, sx=sx, sy=sy, rt=rt)
+        state = BoundaryState(dx=dx, dy=dy, sx=sx, sy=sy, rt=rt)
+        self._boundary_state = (ow, oh, state)
+        return state.copy()
 
     def reset_boundary(self):
         self.update_boundary_transform(p=(0, 0), s=1, rt=0)
@@ -819,6 +831,7 @@ class BoundView(ViewBase, InvisibleView, metaclass=abc.ABCMeta):
         self.data_boundary.data = dict(
             x=[x], y=[y], w=[w], h=[h], r=[rt], sx=[sx], sy=[sy]
         )
+        self._boundary_state = None
 
         state = self.get_boundary_state()
         self.on_boundary_transform(state)
@@ -859,7 +872,7 @@ class BoundView(ViewBase, InvisibleView, metaclass=abc.ABCMeta):
         """
         A helper method for transforming an image data.
 
-        :param image: image data
+        :param image: image data. It could be a strided view (for example, a flipped image ``image[::-1]``).
         :param boundary: boundary parameters
         :return: a dict which is ready for updating {ColumnDataSource}.
         """
@@ -873,6 +886,34 @@ class BoundView(ViewBase, InvisibleView, metaclass=abc.ABCMeta):
 
         if (rt := boundary['rt']) != 0:
             from scipy.ndimage import rotate  # type: ignore[import]
-            image = rotate(image, -rt, reshape=False)
+            # rotate() reads strided input directly and writes a new contiguous array.
+            # Use bilinear sampling (order=1), which skips the spline prefilter pass over the whole image.
+            image = rotate(image, -rt, reshape=False, order=1)
+        else:
+            # only copy at the final step, when the image is still a strided view.
+            image = np.ascontiguousarray(image)
 
         return dict(image=[image], dw=[w], dh=[h], x=[x], y=[y])
+
+    @doc_link()
+    def update_image_data(self, source: ColumnDataSource, data: dict[str, Any] | None):
+        """
+        A helper method for updating an image {ColumnDataSource}.
+
+        When *source* already holds a single image, its columns are patched in place, so Bokeh
+        does not copy and diff the whole data dict. Scalar columns (position and size) are only
+        patched when their value changed. Otherwise, the data is replaced.
+
+        :param source: image data source
+        :param data: result of {#transform_image_data()}. ``None`` to clear *source*.
+        """
+        if data is None:
+            source.data = dict(image=[], dw=[], dh=[], x=[], y=[])
+        elif len((old := source.data)['image']) == 1:
+            patches = {'image': [(0, data['image'][0])]}
+            for k in ('dw', 'dh', 'x', 'y'):
+                if (v := data[k][0]) != old[k][0]:
+                    patches[k] = [(0, v)]
+            source.patch(patches)
+        else:
+            source.data = data
@@ -160,15 +160,18 @@ class Data1DView(DataView, metaclass=abc.ABCMeta):
             self._cache_shank_space = None
             return
 
+        # per-shank x range, by grouping electrodes over sorted shank
+        order = np.argsort(bp.s, kind='stable')
+        s = bp.s[order]
+        x = bp.x[order]
+        group = np.concatenate([[0], np.flatnonzero(np.diff(s)) + 1])
+        x_min = np.minimum.reduceat(x, group)
+        x_max = np.maximum.reduceat(x, group)
+
         shank_space = []
         x0 = 0
         xs = 200
-        for i, s in enumerate(np.unique(bp.s)):
-            x = bp.x[bp.s == s]
-
-            x2 = np.min(x)
-            x3 = np.max(x)
-
+        for i, (x2, x3) in enumerate(zip(x_min, x_max)):
             if i > 0:
                 xs = float(x2 - x0)
                 shank_space.append((float(x0), xs))
@@ -1,11 +1,14 @@
 from __future__ import annotations
 
 import abc
+import asyncio
+import functools
 import logging
 import sys
 from pathlib import Path
 from typing import TypedDict, Final
 
+import bokeh.io
 import numpy as np
 from bokeh.models import ColumnDataSource, GlyphRenderer, Slider, UIElement, TextInput, Tooltip
 from numpy.typing import NDArray
@@ -102,26 +105,52 @@ class ImageHandler(metaclass=abc.ABCMeta):
 
         filename = str(filename)
         logger.debug('from file %s', filename)
-        image = np.asarray(Image.open(filename, mode='r'))
+        image = np.ascontiguousarray(Image.open(filename, mode='r').convert('RGBA'))
 
-        w, h, _ = image.shape
-        image = np.flipud(image.view(dtype=np.uint32).reshape((w, h)))
+        # Array[uint8, H, W, 4] -> Array[uint32, H, W], packed RGBA, reinterpreted without copy.
+        # Flip as a strided view. It is copied once when sending to bokeh.
+        h, w, _ = image.shape
+        image = np.frombuffer(image, dtype=np.uint32).reshape((h, w))[::-1]
 
         logger.debug('as image %s', image.shape)
         return NumpyImageHandler(image, filename)  # type: ignore[return-value]
 
     @classmethod
     def from_tiff(cls, filename: str | Path) -> Self:
+        """
+
+        Image data is memory-mapped, so only the displayed slide is read from disk. When the data
+        is not memory-mappable (compressed or tiled), 2-d pages are decoded on demand, and
+        other pages (RGB samples or depth) are decoded at once.
+
+        :param filename: tiff file
+        :return:
+        """
         logger = logging.getLogger('neurocarto.image')
         import tifffile
         from .image_npy import NumpyImageHandler
 
         filename = str(filename)
         logger.debug('from file %s', filename)
-        image = tifffile.TiffFile(filename, mode='r').asarray()  # TODO memmap?
+        try:
+            image = tifffile.memmap(filename, mode='r')
+        except ValueError:  # not memory-mappable
+            pass
+        else:
+            logger.debug('as image %s', image.shape)
+            return NumpyImageHandler(image, filename)  # type: ignore[return-value]
 
-        logger.debug('as image %s', image.shape)
-        return NumpyImageHandler(image, filename)  # type: ignore[return-value]
+        with tifffile.TiffFile(filename, mode='r') as tif:
+            if len(shape := tif.pages[0].shape) != 2:
+                # pages with samples (RGB) or depth, which cannot be decoded as 2-d pages.
+                logger.debug('as whole image, page %s', shape)
+                image = tif.asarray()
+                logger.debug('as image %s', image.shape)
+                return NumpyImageHandler(image, filename)  # type: ignore[return-value]
+
+        from .image_tiff import TiffImageHandler
+        logger.debug('as lazy pages')
+        return TiffImageHandler(filename)  # type: ignore[return-value]
 
 
 class ImageView(BoundView, metaclass=abc.ABCMeta):
@@ -141,6 +170,9 @@ class ImageView(BoundView, metaclass=abc.ABCMeta):
 
         self._image = image
         self._index: int = 0
+        self._pending_index: int | None = None
+        self._updating_index = False  # ignore slider events caused by update_image()
+        self._rendered_image: tuple | None = None  # (image, index, resolution, boundary) on screen
 
     @property
     def name(self) -> str:
@@ -299,10 +331,18 @@ class ImageView(BoundView, metaclass=abc.ABCMeta):
         return [self.index_slider]
 
     def _on_index_changed(self, s: int):
-        if is_recursive_called():
+        if self._updating_index or is_recursive_called():
             return
 
-        self.update_image(s)
+        # coalesce slider events, only the latest index is processed on the next tick.
+        if self._pending_index is None:
+            run_later(self._process_index_changed)
+        self._pending_index = s
+
+    def _process_index_changed(self):
+        if (s := self._pending_index) is not None:
+            self._pending_index = None
+            self.update_image(s)
 
     def get_resolution_value(self, r: str = None) -> tuple[float, float] | None:
         if r is None:
@@ -314,13 +354,11 @@ class ImageView(BoundView, metaclass=abc.ABCMeta):
         if r == '':
             return None
 
+        # float() ignores surrounding whitespace.
+        w, sep, h = r.partition(',')
         try:
-            if ',' in r:
-                f = r.partition(',')
-                return float(f[0].strip()), float(f[2].strip())
-            else:
-                f = float(r)
-                return f, f
+            fw = float(w)
+            return (fw, float(h)) if sep else (fw, fw)
         except ValueError:
             return None
 
@@ -343,9 +381,10 @@ class ImageView(BoundView, metaclass=abc.ABCMeta):
                 f = image.resolution
                 self.resolution_input.value = f'{f[0]},{f[1]}'
         else:
-            if (image := self.image) is not None:
+            if (image := self.image) is not None and image.resolution != f:
                 image.resolution = f
 
+            # re-entering the current resolution still resets the scale.
             self.update_boundary_transform(s=1)
 
     # ================ #
@@ -362,7 +401,10 @@ class ImageView(BoundView, metaclass=abc.ABCMeta):
 
     def on_boundary_transform(self, state: BoundaryState):
         super().on_boundary_transform(state)
-        self.update_image(self._index)
+
+        # skip when the image on screen is already transformed by the same boundary.
+        if (image := self.image) is None or self._rendered_image != (image, self._index, image.resolution, state):
+            self.update_image(self._index)
 
     def update_image(self, image_data: int | NDArray[np.uint] | None):
         if is_recursive_called():
@@ -371,6 +413,7 @@ class ImageView(BoundView, metaclass=abc.ABCMeta):
         if (image := self.image) is None:
             return
 
+        index = None
         if isinstance(image_data, int) or isinstance(image_data, np.integer):
             self._index = index = int(image_data)
 
@@ -379,15 +422,25 @@ class ImageView(BoundView, metaclass=abc.ABCMeta):
             except (IndexError, TypeError) as e:
                 return
 
+            # slider callback is deferred (see _on_index_changed()), so is_recursive_called()
+            # could not tell it is caused by here. Ignore it explicitly.
+            self._updating_index = True
             try:
                 self.index_slider.value = index
             except (AttributeError, TypeError) as e:
                 pass
+            finally:
+                self._updating_index = False
+
+        self._rendered_image = None
 
         if image_data is None:
-            self.data_image.data = dict(image=[], dw=[], dh=[], x=[], y=[])
+            self.update_image_data(self.data_image, None)
         else:
-            self.data_image.data = self.transform_image_data(image_data)
+            boundary = self.get_boundary_state()
+            self.update_image_data(self.data_image, self.transform_image_data(image_data, boundary))
+            if index is not None:
+                self._rendered_image = (image, index, image.resolution, boundary)
 
 
 class FileImageView(ImageView, StateView[list[ImageViewState]]):
@@ -401,6 +454,7 @@ class FileImageView(ImageView, StateView[list[ImageViewState]]):
         super().__init__(config, logger=logger)
         self.image_root = Path('.')
         self.image_config = {}
+        self._loading_image: Path | None = None
 
     @property
     def name(self) -> str:
@@ -443,14 +497,40 @@ class FileImageView(ImageView, StateView[list[ImageViewState]]):
             if (state := self.save_current_state()) is not None:
                 self.image_config[state['filename']] = state
 
+        self._loading_image = filename
+
         if filename is None:
             self.set_image_handler(None)
             self.visible = False
-        else:
-            self.logger.debug('load(%s)', filename)
-            self.set_image_handler(ImageHandler.from_file(filename))
-            self.visible = True
+            run_later(self.restore_current_state)
+            return
+
+        self.logger.debug('load(%s)', filename)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:  # not in a server event loop
+            self._on_image_loaded(filename, ImageHandler.from_file(filename))
+            return
+
+        # decode in a worker thread, so a large image does not block the event loop.
+        document = bokeh.io.curdoc()
+        future = loop.run_in_executor(None, ImageHandler.from_file, filename)
+        future.add_done_callback(lambda f: document.add_next_tick_callback(functools.partial(self._on_image_loaded, filename, f)))
+
+    def _on_image_loaded(self, filename: Path, image: ImageHandler | asyncio.Future[ImageHandler]):
+        if self._loading_image != filename:  # another image was selected meanwhile
+            return
+
+        if isinstance(image, asyncio.Future):
+            try:
+                image = image.result()
+            except Exception as e:
+                self.logger.warning('load(%s) fail', filename, exc_info=e)
+                return
 
+        self.set_image_handler(image)
+        self.visible = True
         run_later(self.restore_current_state)
 
     # ========= #
@@ -464,7 +544,6 @@ class FileImageView(ImageView, StateView[list[ImageViewState]]):
     def restore_state(self, state: list[ImageViewState]):
         self.logger.debug('restore()')
         for _state in state:  # type:ImageViewState
-            _state = ImageViewState(**_state)
             self.image_config[_state['filename']] = _state
 
     def restore_current_state(self, state: ImageViewState = None):
@@ -0,0 +1,60 @@
+import numpy as np
+from numpy.typing import NDArray
+
+from neurocarto.views.image import ImageHandler
+
+__all__ = ['TiffImageHandler']
+
+
+class TiffImageHandler(ImageHandler):
+    """
+    Load tiff image pages on demand.
+
+    It is used when the image data in a tiff file is not memory-mappable
+    (for example, compressed or tiled), so only the requested page is decoded.
+    """
+
+    def __init__(self, filename: str):
+        """
+
+        :param filename: tiff filename.
+        """
+        super().__init__(filename)
+
+        import tifffile
+        self._file = tifffile.TiffFile(filename, mode='r')
+        self._pages = self._file.pages
+
+        # Array[uint, H, W], the last decoded page
+        self._index: int | None = None
+        self._image: NDArray[np.uint] | None = None
+
+        shape = self._pages[0].shape
+        if len(shape) != 2:
+            self._file.close()
+            raise RuntimeError(f'not a 2-d tiff page : {shape}')
+
+        self._shape: tuple[int, int] = shape
+
+    def __del__(self):
+        try:
+            self._file.close()
+        except AttributeError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def __getitem__(self, index: int) -> NDArray[np.uint] | None:
+        if self._index != index:
+            self._image = self._pages[index].asarray()
+            self._index = index
+        return self._image
+
+    @property
+    def width(self) -> float:
+        return self._shape[1] * self.resolution[0]
+
+    @property
+    def height(self) -> float:
+        return self._shape[0] * self.resolution[1]
@@ -1,5 +1,6 @@
 from typing import runtime_checkable, Protocol
 
+import bokeh.io
 from bokeh.models import UIElement, Div
 
 from neurocarto.config import CartoConfig
@@ -69,6 +70,8 @@ class ElectrodeEfficiencyData(ViewBase, ExtensionView, InvisibleView, DynamicVie
         )
 
     def on_probe_update(self, probe: ProbeDesp, chmap, electrodes):
+        label = value = ''
+
         if chmap is not None and isinstance(probe, ProbeElectrodeEfficiencyProtocol):
             # self.logger.debug('on_probe_update()')
             bp = BlueprintFunctions(probe, chmap)
@@ -78,19 +81,17 @@ class ElectrodeEfficiencyData(ViewBase, ExtensionView, InvisibleView, DynamicVie
                 data = probe.view_ext_statistics_info(bp)
             except BaseException as electrodes:
                 self.logger.warning(repr(electrodes), exc_info=electrodes)
-                self.label_columns_div.text = ''
-                self.value_columns_div.text = ''
             else:
-                label = []
-                value = []
-                for _label, _value in data.items():
-                    label.append(f'<div>{_label}</div>')
-                    value.append(f'<div>{_value}</div>')
-                self.label_columns_div.text = ''.join(label)
-                self.value_columns_div.text = ''.join(value)
-        else:
-            self.label_columns_div.text = ''
-            self.value_columns_div.text = ''
-
-        self.label_columns_div.visible = len(self.label_columns_div.text) > 0
-        self.value_columns_div.visible = len(self.value_columns_div.text) > 0
+                label = ''.join([f'<div>{_label}</div>' for _label in data])
+                value = ''.join([f'<div>{_value}</div>' for _value in data.values()])
+
+        # send both columns in one document patch.
+        document = bokeh.io.curdoc()
+        document.hold('collect')
+        try:
+            self.label_columns_div.text = label
+            self.value_columns_div.text = value
+            self.label_columns_div.visible = len(label) > 0
+            self.value_columns_div.visible = len(value) > 0
+        finally:
+            document.unhold()
@@ -0,0 +1,63 @@
+import types
+import unittest
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from neurocarto.util.atlas_slice import SliceView
+
+
+# noinspection PyTypeChecker
+def brain_from_volume(volume: np.ndarray):
+    """a fake atlas brain with a given (AP, DV, ML) reference volume."""
+    return types.SimpleNamespace(reference=volume, resolution=(10, 10, 10), atlas_name='test')
+
+
+class SliceViewPlaneTest(unittest.TestCase):
+    def setUp(self):
+        # Array[uint16, AP, DV, ML], every voxel has a distinct value
+        self.volume = np.arange(7 * 5 * 6, dtype=np.uint16).reshape((7, 5, 6))
+        self.brain = brain_from_volume(self.volume)
+
+    def expect(self, view: SliceView, o: np.ndarray) -> np.ndarray:
+        """direct indexing on the volume permuted into (plane, y, x)."""
+        p, x, y = view.project_index
+        volume = self.volume.transpose(p, y, x)
+        h, w = np.mgrid[0:view.height, 0:view.width]
+        return volume[np.clip(o, 0, view.n_plane - 1), h, w]
+
+    def test_plane_int(self):
+        for name in ('coronal', 'sagittal', 'transverse'):
+            view = SliceView(self.brain, name)
+            for plane in range(-1, view.n_plane + 1):
+                o = np.full((view.height, view.width), plane)
+                assert_array_equal(self.expect(view, o), view.plane(plane), err_msg=f'{name} plane={plane}')
+
+    def test_plane_offset(self):
+        for name in ('coronal', 'sagittal', 'transverse'):
+            view = SliceView(self.brain, name)
+            for plane, dh, dv in [(2, 0, 0), (2, 1, -1), (0, -2, 3), (view.n_plane - 1, 2, 2)]:
+                o = plane + view.offset(dh, dv)
+                assert_array_equal(self.expect(view, o), view.plane((plane, dh, dv)), err_msg=f'{name} o={(plane, dh, dv)}')
+
+    def test_plane_array(self):
+        rng = np.random.default_rng(0)
+        for name in ('coronal', 'sagittal', 'transverse'):
+            view = SliceView(self.brain, name)
+            o = rng.integers(-1, view.n_plane + 1, size=(view.height, view.width))
+            assert_array_equal(self.expect(view, o), view.plane(o), err_msg=name)
+
+    def test_plane_non_contiguous(self):
+        reference = np.asfortranarray(self.volume)
+        rng = np.random.default_rng(0)
+        for name in ('coronal', 'sagittal', 'transverse'):
+            view = SliceView(self.brain, name, reference)
+            self.assertIs(reference, view.reference)
+
+            o = rng.integers(-1, view.n_plane + 1, size=(view.height, view.width))
+            assert_array_equal(self.expect(view, o), view.plane(o), err_msg=name)
+            assert_array_equal(self.expect(view, np.full_like(o, 1)), view.plane(1), err_msg=name)
+
+
+if __name__ == '__main__':
+    unittest.main()
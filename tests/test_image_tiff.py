@@ -0,0 +1,72 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from numpy.testing import assert_array_equal
+
+from neurocarto.views.image import ImageHandler
+
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+
+@unittest.skipIf(tifffile is None, 'tifffile not installed')
+class ImageHandlerFromTiffTest(unittest.TestCase):
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = Path(self._directory.name)
+        # Array[uint16, N, H, W]
+        self.image = np.arange(3 * 4 * 5, dtype=np.uint16).reshape((3, 4, 5))
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def assert_image(self, handler: ImageHandler, image: np.ndarray):
+        self.assertEqual(len(image), len(handler))
+        self.assertEqual(image.shape[2], handler.width)
+        self.assertEqual(image.shape[1], handler.height)
+        for i in range(len(image)):
+            assert_array_equal(image[i], handler[i])
+
+    def test_memmap(self):
+        from neurocarto.views.image_npy import NumpyImageHandler
+        file = self.directory / 'image.tif'
+        tifffile.imwrite(file, self.image, photometric='minisblack')
+
+        handler = ImageHandler.from_tiff(file)
+        self.assertIsInstance(handler, NumpyImageHandler)
+        self.assertIsInstance(handler.image, np.memmap)
+        self.assert_image(handler, self.image)
+
+    def test_lazy_pages(self):
+        from neurocarto.views.image_tiff import TiffImageHandler
+        file = self.directory / 'image.tif'
+        with tifffile.TiffWriter(file) as tif:
+            for page in self.image:
+                tif.write(page, photometric='minisblack', compression='zlib')
+
+        handler = ImageHandler.from_tiff(file)
+        self.assertIsInstance(handler, TiffImageHandler)
+        self.assert_image(handler, self.image)
+
+    def test_rgb_pages(self):
+        from neurocarto.views.image_npy import NumpyImageHandler
+        from neurocarto.views.image_tiff import TiffImageHandler
+        file = self.directory / 'image.tif'
+        image = np.zeros((4, 5, 3), dtype=np.uint8)
+        image[..., 0] = 255
+        tifffile.imwrite(file, image, photometric='rgb', compression='zlib')
+
+        handler = ImageHandler.from_tiff(file)
+        self.assertIsInstance(handler, NumpyImageHandler)
+        assert_array_equal(tifffile.imread(file), handler.image)
+
+        with self.assertRaises(RuntimeError):
+            TiffImageHandler(str(file))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import random
+import unittest
+from pathlib import Path
+
+import numpy as np
+from numpy.testing import assert_array_equal, assert_allclose
+
+from neurocarto.probe_npx import NpxProbeDesp, ChannelMap
+from neurocarto.probe_npx.select import load_select
+from neurocarto.probe_npx.stat import npx_electrode_density, npx_electrode_probability, npx_channel_efficiency
+from neurocarto.util.util_blueprint import BlueprintFunctions
+
+if (res := Path('res')).exists():
+    RES = res
+elif (res := Path('../res')).exists():
+    RES = res
+else:
+    raise RuntimeError()
+
+
+class ElectrodeDensityTest(unittest.TestCase):
+    """
+    The density of a channel is the number of channels over the number of electrodes in its
+    3x3 neighborhood. Both NP1 and NP24 have two columns, so every column is an edge column,
+    and a neighborhood has 2 columns, with 2 rows on the edge rows, otherwise 3 rows.
+    The density curve takes the row maximum, then the maximum over 3 neighbor rows.
+    """
+
+    def new_channelmap(self, code: int, electrodes: list[tuple[int, int, int]]) -> ChannelMap:
+        chmap = ChannelMap(code)
+        for e in electrodes:
+            chmap.add_electrode(e)
+        return chmap
+
+    def assert_density(self, chmap: ChannelMap, expect: np.ndarray):
+        pt = chmap.probe_type
+        result = npx_electrode_density(chmap)
+        self.assertEqual((pt.n_shank, 2, pt.n_row_shank), result.shape)
+        assert_allclose(expect, result[:, 0], atol=1e-6)
+        assert_allclose(np.broadcast_to(np.arange(pt.n_row_shank) * pt.r_space, expect.shape), result[:, 1])
+
+    def test_empty(self):
+        for code in (0, 24):
+            chmap = ChannelMap(code)
+            pt = chmap.probe_type
+            self.assert_density(chmap, np.zeros((pt.n_shank, pt.n_row_shank)))
+
+    def test_np1(self):
+        chmap = self.new_channelmap(0, [
+            (0, 0, 0), (0, 1, 0), (0, 0, 1),  # bottom edge rows
+            (0, 0, 100),  # isolated
+            (0, 1, 479),  # top edge row
+        ])
+
+        expect = np.zeros((1, 480))
+        expect[0, 0] = 3 / 4  # (0, 0, 0) and (0, 1, 0): 3 channels over 2x2 electrodes
+        expect[0, 1] = 3 / 4  # from row 0, (0, 0, 1) itself is 3 / 6
+        expect[0, 2] = 3 / 6  # from row 1
+        expect[0, 99:102] = 1 / 6
+        expect[0, 478:480] = 1 / 4
+        self.assert_density(chmap, expect)
+
+    def test_np24(self):
+        chmap = self.new_channelmap(24, [
+            (3, 0, 639), (3, 1, 639), (3, 1, 638),  # top edge rows on the last shank
+            (0, 0, 5),  # isolated
+        ])
+
+        expect = np.zeros((4, 640))
+        expect[3, 639] = 3 / 4
+        expect[3, 638] = 3 / 4  # from row 639, (3, 1, 638) itself is 3 / 6
+        expect[3, 637] = 3 / 6  # from row 638
+        expect[0, 4:7] = 1 / 6
+        self.assert_density(chmap, expect)
+
+
+class ElectrodeProbabilityTest(unittest.TestCase):
+    SAMPLE_TIMES = 10
+
+    def setUp(self):
+        self.probe = NpxProbeDesp()
+        self.chmap = self.probe.load_from_file(RES / 'Fig3_example.imro')
+        self.blueprint = self.probe.load_blueprint(RES / 'Fig3_example.blueprint.npy', self.chmap)
+
+    def sample(self, seed: int) -> list:
+        """sampled channelmaps, as the same way npx_electrode_probability() does."""
+        random.seed(seed)
+        np.random.seed(seed)
+
+        selector = load_select('default')
+        chmap = self.chmap
+        ret = []
+        for _ in range(self.SAMPLE_TIMES):
+            chmap = selector(self.probe, chmap, self.blueprint)
+            ret.append(chmap)
+        return ret
+
+    def test_electrode_probability(self):
+        random.seed(0)
+        np.random.seed(0)
+        result = npx_electrode_probability(self.probe, self.chmap, self.blueprint, 'default', sample_times=self.SAMPLE_TIMES)
+
+        samples = self.sample(0)
+        pt = self.chmap.probe_type
+
+        summation = np.zeros((pt.n_shank, pt.n_col_shank, pt.n_row_shank), dtype=int)
+        for chmap in samples:
+            for e in chmap.electrodes:
+                summation[e.shank, e.column, e.row] += 1
+
+        bp = BlueprintFunctions(self.probe, self.chmap)
+        bp.set_blueprint(self.blueprint)
+        channel_efficiency = [npx_channel_efficiency(bp, chmap) for chmap in samples]
+
+        self.assertEqual(self.SAMPLE_TIMES, result.sample_times)
+        self.assertEqual(sum([self.probe.is_valid(chmap) for chmap in samples]), result.complete)
+        assert_array_equal(summation, result.summation)
+        assert_allclose(channel_efficiency, result.channel_efficiency_)
+
+
+if __name__ == '__main__':
+    unittest.main()
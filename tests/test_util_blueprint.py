@@ -666,5 +666,41 @@ class UtilBlueprintTest(unittest.TestCase):
             0, 0,
         ]))
 
+
+class ExchangeShankTest(unittest.TestCase):
+    def setUp(self):
+        probe = NpxProbeDesp()
+        self.bp = BlueprintFunctions(probe, probe.new_channelmap(24))
+        self.blueprint = np.random.default_rng(0).integers(0, 4, size=len(self.bp.s))
+        self.bp.set_blueprint(self.blueprint)
+
+    def expect(self, shank: list[int]) -> NDArray[np.int_]:
+        bp = self.bp
+        ret = np.zeros_like(self.blueprint)
+        for i, s in enumerate(shank):
+            ret[bp.s == i] = self.blueprint[bp.s == s]
+        return ret
+
+    def test_permutation(self):
+        from neurocarto.util.edit._actions import exchange_shank
+        exchange_shank(self.bp, [3, 2, 1, 0])
+        assert_array_equal(self.expect([3, 2, 1, 0]), self.bp.blueprint())
+
+    def test_duplicated_shank(self):
+        from neurocarto.util.edit._actions import exchange_shank
+        exchange_shank(self.bp, [0, 0, 2, 2])
+        assert_array_equal(self.expect([0, 0, 2, 2]), self.bp.blueprint())
+
+    def test_out_of_range_shank(self):
+        from neurocarto.util.edit._actions import exchange_shank
+        for shank in ([-1, 2, 1, 0], [0, 1, 2, 4]):
+            with self.assertRaises(RuntimeError):
+                exchange_shank(self.bp, shank)
+            assert_array_equal(self.blueprint, self.bp.blueprint())
+
+        with self.assertRaises(RuntimeError):
+            exchange_shank(self.bp, [0, 1, 2])
+
+
 if __name__ == '__main__':
     unittest.main()